@@ -10,14 +10,11 @@ class ClientAgent:
             "אני רוצה לבטל את המנוי לטלוויזיה שלי. אני לא משתמש בזה יותר.",
             "הבנתי — מה עליי לעשות כדי לוודא שבוטל ותשלחו לי אישור?",
         ]
-        self.turn = 0
+        self._it = iter(self.scripts)
 
     def next_utterance(self) -> str:
-        if self.turn < len(self.scripts):
-            txt = self.scripts[self.turn]
-            self.turn += 1
-            return txt
-        return ""
+        # iterator with a default: no bounds check or counter bookkeeping
+        return next(self._it, "")
 
     def reset(self):
-        self.turn = 0
+        self._it = iter(self.scripts)
@@ -7,31 +7,56 @@ CustomerServiceAgent (final)
 """
 
 from __future__ import annotations
+import asyncio
 import os
 import json
 import logging
 import random
-import re
-from typing import Dict
+from functools import lru_cache
+from typing import Dict, Optional
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
+logger.addHandler(logging.NullHandler())  # logging config belongs to the app entrypoint
 
 # Try to import litellm but don't fail if not available
 try:
     import litellm
     from litellm import AuthenticationError, RateLimitError
+    LLMTimeout = getattr(litellm, "Timeout", TimeoutError)
 except Exception:
     litellm = None
     AuthenticationError = Exception
     RateLimitError = Exception
+    LLMTimeout = TimeoutError
+
+
+# Intent keywords in priority order. These are plain substring matches, so a
+# C-level `in` scan beats the regex engine here; keep a compiled pattern as a
+# fallback only if the rules ever grow real regex structure.
+_INTENTS = (
+    ("cancel", ("לבטל", "בטל", "לבקש ביטול")),
+    ("confirm_q", ("אישור", "איך אדע")),
+    ("how", ("מה עליי לעשות", "כיצד", "איך")),
+    ("done", ("סיימתם", "בוצע", "סגור")),
+)
 
 
 class CustomerServiceAgent:
-    def __init__(self, model: str = "gpt-3.5-turbo"):
+    def __init__(self, model: str = "gpt-3.5-turbo", request_timeout: Optional[float] = None):
         self.model = model
         self.state = {}
 
+        # Per-request timeout (seconds) so a stalled provider can't hang the
+        # pipeline; overridable via CW_LLM_TIMEOUT.
+        if request_timeout is None:
+            request_timeout = float(os.getenv("CW_LLM_TIMEOUT", "15"))
+        self.request_timeout = request_timeout
+        self.max_retries = 3
+
+        # Hedge window (seconds) for reply_hedged: how long to wait on the
+        # LLM before answering with the scripted reply instead.
+        self.hedge_timeout = float(os.getenv("CW_CS_HEDGE_TIMEOUT", "2.0"))
+
         # Structured fallback/scripted replies
         self.scripted_flow = [
             {"reply": "אנא אשר את מספר תעודת הזהות שלך כדי שנוכל להמשיך.", "action": "verify"},
@@ -50,30 +75,95 @@ class CustomerServiceAgent:
         # Control whether to call OpenAI/LiteLLM if available
         self.use_openai = os.getenv("CW_CS_USE_OPENAI", "0").lower() in ("1", "true", "yes")
 
+        # Intent label -> reply factory (see _INTENTS for the keyword lists)
+        self._intent_replies = {
+            "cancel": lambda: self.scripted_flow[0],  # verify
+            "confirm_q": lambda: {"reply": "נשלח אישור למייל ברגע שהביטול יושלם. מה כתובת המייל שלך?", "action": "verify"},
+            "how": lambda: self.scripted_flow[1],  # explain
+            "done": lambda: random.choice(self.extra_replies),
+        }
+
+        # Per-instance response cache keyed by whitespace-normalized text.
+        # Built here (not as a decorator) so the cache doesn't hold `self`
+        # in its keys or outlive the agent.
+        self._cached_reply = lru_cache(maxsize=512)(self._reply_uncached)
+
+        # Semantic cache for the LLM path: paraphrases of the same intent
+        # ("אני רוצה לבטל" / "אבקש ביטול") reuse the stored reply when the
+        # embedding cosine similarity clears the threshold. FIFO-capped.
+        self.semantic_cache_threshold = float(os.getenv("CW_CS_SEMCACHE_TAU", "0.92"))
+        self.semantic_cache_max = 2048
+        self._sem_vecs = None   # np.ndarray (N x D), rows L2-normalized
+        self._sem_vals = []     # parallel list of reply dicts
+
     # Simple rule-based mapper to pick a script step
     def _scripted_reply_for(self, user_text: str) -> Dict:
-        t = user_text.strip().lower()
-
-        # Keywords-based decisions (Hebrew substrings)
-        if re.search(r"בטל|לבטל|לבקש ביטול|לבטל", t):
-            return self.scripted_flow[0]  # verify
-        if re.search(r"אישור|אישורים|איך אדע|אישור במייל", t):
-            return {"reply": "נשלח אישור למייל ברגע שהביטול יושלם. מה כתובת המייל שלך?", "action": "verify"}
-        if re.search(r"מה עליי לעשות|כיצד|איך", t):
-            return self.scripted_flow[1]  # explain
-        if re.search(r"סיימתם|בוצע|בוצעה|סגור", t):
-            return random.choice(self.extra_replies)
+        for label, keywords in _INTENTS:
+            if any(k in user_text for k in keywords):
+                return self._intent_replies[label]()
         # default: confirm or ask to continue
         return {"reply": "האם ברצונך שאבצע את הביטול כעת?", "action": "explain"}
 
+    # ------------------------------
+    # Semantic cache helpers
+    # ------------------------------
+    def _embed(self, text: str):
+        """Return an L2-normalized embedding vector for text, or None."""
+        try:
+            import numpy as np
+            # Same per-request bound as the completion call: a stalled
+            # embedding request must not hang reply() before it.
+            resp = litellm.embedding(
+                model="text-embedding-3-small",
+                input=[text],
+                timeout=self.request_timeout,
+            )
+            vec = np.asarray(resp["data"][0]["embedding"], dtype=np.float32)
+            norm = float(np.linalg.norm(vec))
+            return vec / norm if norm else None
+        except Exception as e:
+            logger.debug("embedding failed (semantic cache skipped): %s", e)
+            return None
+
+    def _semantic_lookup(self, vec) -> Optional[Dict]:
+        if vec is None or self._sem_vecs is None or not self._sem_vals:
+            return None
+        sims = self._sem_vecs @ vec
+        best = int(sims.argmax())
+        if float(sims[best]) >= self.semantic_cache_threshold:
+            logger.info("CS Agent: semantic cache hit (sim=%.3f)", float(sims[best]))
+            return dict(self._sem_vals[best])
+        return None
+
+    def _semantic_store(self, vec, reply: Dict):
+        if vec is None:
+            return
+        import numpy as np
+        if self._sem_vecs is None:
+            self._sem_vecs = vec.reshape(1, -1)
+            self._sem_vals = [dict(reply)]
+            return
+        self._sem_vecs = np.vstack([self._sem_vecs, vec])
+        self._sem_vals.append(dict(reply))
+        if len(self._sem_vals) > self.semantic_cache_max:  # FIFO eviction
+            self._sem_vecs = self._sem_vecs[1:]
+            self._sem_vals.pop(0)
+
     def _call_openai(self, user_text: str) -> Dict:
         """
         Attempt to call litellm/OpenAI and parse JSON response.
         Returns a dict with reply/action on success, otherwise raises.
+        Near-duplicate prompts are served from the semantic cache instead
+        of a fresh completion round trip.
         """
         if litellm is None:
             raise RuntimeError("litellm not installed")
 
+        vec = self._embed(user_text)
+        cached = self._semantic_lookup(vec)
+        if cached is not None:
+            return cached
+
         prompt = f"""
 אתה נציג שירות לקוחות של חברת טלוויזיה.
 הלקוח אמר: "{user_text}"
@@ -84,7 +174,22 @@ class CustomerServiceAgent:
 החזר JSON בפורמט:
 {{"reply": "...", "action": "verify"|"explain"|"confirm"|"close"}}
 """
-        resp = litellm.completion(model=self.model, messages=[{"role": "user", "content": prompt}])
+        # Bounded retry: a timed-out request is retried instead of blocking
+        # the whole turn; anything else propagates to the caller's fallback.
+        last_err = None
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                resp = litellm.completion(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    timeout=self.request_timeout,
+                )
+                break
+            except (TimeoutError, LLMTimeout) as e:
+                last_err = e
+                logger.warning("LLM call timed out (attempt %d/%d): %s", attempt, self.max_retries, e)
+        else:
+            raise RuntimeError(f"LLM timed out after {self.max_retries} attempts: {last_err}")
         # Adapt to litellm response shape safely
         try:
             raw = None
@@ -101,6 +206,7 @@ class CustomerServiceAgent:
             data = json.loads(raw)
             if not isinstance(data, dict) or "reply" not in data:
                 raise ValueError("Invalid LLM format")
+            self._semantic_store(vec, data)
             return data
         except Exception as e:
             raise RuntimeError(f"LLM response parse failed: {e}")
@@ -111,7 +217,59 @@ class CustomerServiceAgent:
         Behavior:
           - If CW_CS_USE_OPENAI=1 and litellm available, try LLM with fallback to scripted replies.
           - Otherwise, use deterministic scripted replies (safe for demo).
+        Identical (whitespace-normalized) inputs hit an LRU cache on the
+        scripted path; LLM mode bypasses the cache to keep replies fresh.
+        """
+        if not self.use_openai:
+            key = " ".join(user_text.split())
+            # copy so callers can't mutate the cached entry
+            return dict(self._cached_reply(key))
+        return self._reply_uncached(user_text)
+
+    async def reply_hedged(self, user_text: str, hedge_timeout: Optional[float] = None) -> Dict:
+        """
+        Speculative fan-out for bounded latency: kick off the LLM call and
+        compute the scripted reply in parallel. If the LLM answers within
+        the hedge window, use it; otherwise abandon it and return the
+        scripted reply immediately. With use_openai off this is just the
+        normal scripted path.
+        """
+        if not (self.use_openai and litellm is not None):
+            return self.reply(user_text)
+
+        if hedge_timeout is None:
+            hedge_timeout = self.hedge_timeout
+
+        task = asyncio.create_task(asyncio.to_thread(self._call_openai, user_text))
+        scripted = self._scripted_reply_for(user_text)
+        done, _ = await asyncio.wait({task}, timeout=hedge_timeout)
+        if task in done and task.exception() is None:
+            logger.info("CS Agent: hedged LLM reply arrived in time")
+            return task.result()
+        # cancel() can't interrupt the to_thread worker, so the call keeps
+        # running in the background; retrieve its eventual exception so
+        # asyncio doesn't warn "Task exception was never retrieved" on GC.
+        task.add_done_callback(lambda t: t.exception() if not t.cancelled() else None)
+        task.cancel()
+        logger.info("CS Agent: hedge window expired — using scripted reply")
+        return scripted
+
+    async def reply_many(self, texts: list, concurrency: int = 8) -> list:
+        """
+        Reply to many utterances concurrently with bounded fan-out.
+        Wall-clock drops from the sum of per-call latencies to roughly
+        max latency x ceil(N / concurrency) when the LLM path is active.
+        Results are returned in input order.
         """
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(text: str) -> Dict:
+            async with sem:
+                return await asyncio.to_thread(self.reply, text)
+
+        return list(await asyncio.gather(*(one(t) for t in texts)))
+
+    def _reply_uncached(self, user_text: str) -> Dict:
         # If OpenAI usage requested and available, attempt it
         if self.use_openai and litellm is not None:
             try:
@@ -1,10 +1,11 @@
 """
 LoggerAgent: saves logs (json) and redacts PII (very simple: mask long digit sequences).
 """
-import os, json, re
+import os, json
 from pathlib import Path
 
-PII_PATTERN = re.compile(r"\b(\d{6,})\b")  # simplistic: sequences >=6 digits
+_MIN_PII_RUN = 6  # digit runs this long or longer get masked
+_REDACT_FIELDS = ("text", "transcript")
 
 class LoggerAgent:
     def __init__(self, out_dir: str = "outputs/logs"):
@@ -14,17 +15,53 @@ class LoggerAgent:
 
     def redact(self, text: str) -> str:
         if not text: return text
-        return PII_PATTERN.sub(lambda m: f"***{m.group(1)[-4:]}", text)
+        # Most utterances carry no digits at all; a plain byte scan is far
+        # cheaper than walking the string run by run to find nothing.
+        if not any(c.isdigit() for c in text): return text
+        # Two-state scan over digit/non-digit runs: no regex engine, no
+        # per-match Python callback. Runs >= _MIN_PII_RUN keep only their
+        # last four digits.
+        out = []
+        i, n = 0, len(text)
+        while i < n:
+            j = i
+            if text[i].isdigit():
+                while j < n and text[j].isdigit():
+                    j += 1
+                if j - i >= _MIN_PII_RUN:
+                    out.append("***")
+                    out.append(text[j - 4:j])
+                else:
+                    out.append(text[i:j])
+            else:
+                while j < n and not text[j].isdigit():
+                    j += 1
+                out.append(text[i:j])
+            i = j
+        return "".join(out)
 
     def log(self, entry: dict):
-        # redact any 'text' fields
-        e = json.loads(json.dumps(entry))  # shallow copy
-        if "text" in e: e["text"] = self.redact(e["text"])
-        if "transcript" in e: e["transcript"] = self.redact(e["transcript"])
+        # redact any PII-bearing fields while copying
+        # shallow copy is enough: only top-level string values get replaced
+        e = dict(entry)
+        for k in _REDACT_FIELDS:
+            v = e.get(k)
+            if isinstance(v, str):
+                e[k] = self.redact(v)
         self.logs.append(e)
 
-    def save(self, fname="logs.json"):
+    def save(self, fname="logs.json", pretty=False, jsonl=False):
+        # Compact output by default: indent=2 roughly doubles serialization
+        # work for a file nothing human reads on the hot path. jsonl=True
+        # streams one record per line so peak memory stays at one entry.
         p = self.out_dir / fname
-        with open(p, "w", encoding="utf-8") as fh:
-            json.dump(self.logs, fh, ensure_ascii=False, indent=2)
+        with open(p, "w", encoding="utf-8", buffering=1 << 20) as fh:
+            if jsonl:
+                for e in self.logs:
+                    fh.write(json.dumps(e, ensure_ascii=False))
+                    fh.write("\n")
+            elif pretty:
+                json.dump(self.logs, fh, ensure_ascii=False, indent=2)
+            else:
+                json.dump(self.logs, fh, ensure_ascii=False, separators=(",", ":"))
         return str(p)
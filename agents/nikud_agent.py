@@ -11,14 +11,14 @@ Behavior:
  - Small LRU-like cache avoids repeated work for identical inputs.
 """
 
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional
 import logging
 import subprocess
-import shlex
+import sys
 from functools import lru_cache
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
+logger.addHandler(logging.NullHandler())  # logging config belongs to the app entrypoint
 
 
 class NikudAgent:
@@ -31,8 +31,16 @@ class NikudAgent:
         self.cli_path = phonikud_cli_path
         self._phonemizer_instance = None
         self._module = None
+        # Entrypoint resolved exactly once at init; None means no usable API.
+        self._phon_fn: Optional[Callable] = None
         if self.use_real:
             self._module = self._import_phonikud()
+            if self._module is not None:
+                self._phon_fn = self._resolve_entrypoint(self._module)
+        # Per-instance memoization. Built here rather than as a method
+        # decorator so the cache key is just the text — decorating a bound
+        # method would pin `self` into every key and keep the agent alive.
+        self._vocalize_cached = lru_cache(maxsize=1024)(self._vocalize_using_python_lib)
 
     # Public API
     def add_nikud(self, text: str) -> Dict:
@@ -45,10 +53,10 @@ class NikudAgent:
             return {"vocalized": "", "phonemes": None}
 
         # 1) try Python library implementation if available
-        if self._module is not None:
+        if self._phon_fn is not None:
             try:
                 # use cached wrapper to avoid repeated heavy calls
-                vocalized, phonemes = self._vocalize_using_python_lib_cached(text)
+                vocalized, phonemes = self._vocalize_cached(text)
                 return {"vocalized": vocalized, "phonemes": phonemes}
             except Exception as e:
                 logger.warning("phonikud python API failed: %s", e)
@@ -78,37 +86,22 @@ class NikudAgent:
             logger.info("phonikud not importable: %s", e)
             return None
 
-    # ------------------------------
-    # Caching wrapper
-    # ------------------------------
-    @lru_cache(maxsize=1024)
-    def _vocalize_using_python_lib_cached(self, text: str):
-        # lru_cache requires args to be hashable -> we pass raw text only
-        return self._vocalize_using_python_lib(text)
-
     # ------------------------------
     # Python-library integration
     # ------------------------------
-    def _vocalize_using_python_lib(self, text: str):
+    def _resolve_entrypoint(self, module) -> Optional[Callable]:
         """
-        Attempt various phonikud APIs:
+        Pick the phonikud entrypoint once at init time so per-input calls
+        don't re-run the hasattr/dir() probing ladder:
          - phonemize(text)
          - Phonemizer().phonemize(text)
-         - fallbacks by scanning candidate names
-        Returns (vocalized_str, phonemes_or_none)
+         - common fallback names, then a dir() scan for likely callables
+        Returns a bound callable or None if nothing usable is found.
         """
-        module = self._module
-        if not module:
-            raise RuntimeError("phonikud module not available")
-
         # Preferred: phonemize function
-        if hasattr(module, "phonemize"):
-            try:
-                res = module.phonemize(text)
-                # phonemize often returns a str (phoneme sequence); we put it into vocalized
-                return str(res), None
-            except Exception as e:
-                logger.debug("phonemize call failed: %s", e)
+        fn = getattr(module, "phonemize", None)
+        if callable(fn):
+            return fn
 
         # Preferred: Phonemizer class
         if hasattr(module, "Phonemizer"):
@@ -117,44 +110,43 @@ class NikudAgent:
                     P = getattr(module, "Phonemizer")
                     # instantiate with defaults
                     self._phonemizer_instance = P()
-                # call instance.phonemize if present
-                instance = self._phonemizer_instance
-                if hasattr(instance, "phonemize"):
-                    res = instance.phonemize(text)
-                    return str(res), None
+                bound = getattr(self._phonemizer_instance, "phonemize", None)
+                if callable(bound):
+                    return bound
             except Exception as e:
-                logger.debug("Phonemizer.phonemize failed: %s", e)
+                logger.debug("Phonemizer instantiation failed: %s", e)
 
         # Try other common function names (best-effort)
         for fn_name in ("diacritize", "add_diacritics", "add_nikud", "nikud", "vocalize", "to_nikud"):
-            if hasattr(module, fn_name):
-                try:
-                    fn = getattr(module, fn_name)
-                    res = fn(text)
-                    if isinstance(res, dict):
-                        vocal = res.get("vocalized") or res.get("nikud") or str(res)
-                        phon = res.get("phonemes")
-                        return str(vocal), phon
-                    if isinstance(res, (list, tuple)):
-                        return str(res[0]), None
-                    return str(res), None
-                except Exception as e:
-                    logger.debug("fallback %s failed: %s", fn_name, e)
-                    continue
-
-        # As a last resort, try to call any callable that looks promising
+            fn = getattr(module, fn_name, None)
+            if callable(fn):
+                return fn
+
+        # As a last resort, take any callable that looks promising
         for name in dir(module):
             lname = name.lower()
             if lname.startswith(("diac", "phon", "nik", "voca")):
                 attr = getattr(module, name)
                 if callable(attr):
-                    try:
-                        res = attr(text)
-                        return str(res), None
-                    except Exception:
-                        continue
+                    return attr
 
-        raise RuntimeError("phonikud installed but no usable API found")
+        logger.info("phonikud installed but no usable API found")
+        return None
+
+    def _vocalize_using_python_lib(self, text: str):
+        """
+        Call the entrypoint resolved at init.
+        Returns (vocalized_str, phonemes_or_none)
+        """
+        if self._phon_fn is None:
+            raise RuntimeError("phonikud module not available or no usable API found")
+        res = self._phon_fn(text)
+        if isinstance(res, dict):
+            vocal = res.get("vocalized") or res.get("nikud") or str(res)
+            return str(vocal), res.get("phonemes")
+        if isinstance(res, (list, tuple)):
+            return str(res[0]), None
+        return str(res), None
 
     # ------------------------------
     # CLI integration
@@ -165,9 +157,10 @@ class NikudAgent:
         Example call (adjust flags according to the CLI):
           python path/to/phonikud_cli.py --text "..." --json
         """
-        cmd = f'python {shlex.quote(cli_path)} --text {shlex.quote(text)} --json'
+        # argv list: no /bin/sh fork, no quoting needed
+        cmd = [sys.executable, cli_path, "--text", text, "--json"]
         logger.info("Calling phonikud CLI: %s", cmd)
-        proc = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=30)
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
         if proc.returncode != 0:
             raise RuntimeError(f"phonikud CLI error: {proc.stderr.strip()}")
         out = proc.stdout.strip()
@@ -2,24 +2,108 @@
 Robust STTAgent for CrowdWisdom project.
 
 - Honors CW_STT_FORCE_MOCK env var or force_mock constructor arg.
-- Supports three backends:
-    1. whisper_timestamped (local)
-    2. openai-whisper (local module "whisper")
-    3. OpenAI API (if model_size == "openai")
+- Supports four backends:
+    1. faster-whisper (local, CTranslate2 int8 + batched inference)
+    2. whisper_timestamped (local)
+    3. openai-whisper (local module "whisper")
+    4. OpenAI API (if model_size == "openai")
 - Falls back to a deterministic MOCK that returns a single segment.
 - transcribe(audio_path) -> dict: {'text': str, 'segments': List[{'start','end','text'}], 'language': str}
 - export_srt(segments, out_path) writes an SRT file.
 """
 
 from __future__ import annotations
+import asyncio
 import os
 import logging
 import contextlib
+import struct
 import wave
+from functools import lru_cache
 from typing import List, Dict, Optional, Any
 
 logger = logging.getLogger(__name__)
 
+# Process-wide import probe cache: a failed (or successful) import of a heavy
+# backend is only attempted once, so constructing a second STTAgent doesn't
+# re-pay the probe.
+_IMPORT_CACHE: Dict[str, Optional[Any]] = {}
+
+
+def _try_import(name: str) -> Optional[Any]:
+    if name not in _IMPORT_CACHE:
+        try:
+            import importlib
+            _IMPORT_CACHE[name] = importlib.import_module(name)
+        except Exception as e:
+            logger.debug("[STTAgent] %s not importable: %s", name, e)
+            _IMPORT_CACHE[name] = None
+    return _IMPORT_CACHE[name]
+
+
+def _read_wav_duration(path: str) -> float:
+    """
+    Read a WAV's duration in seconds from its header.
+
+    Fast path: for a canonical 44-byte RIFF header — "fmt " at offset 12
+    and "data" at offset 36 — the duration is data_chunk_size / byte_rate,
+    both read straight from the header with struct.unpack instead of the
+    wave module's chunk-tree walk. Anything non-canonical (extra chunks
+    such as ffmpeg's LIST/INFO, zero byte rate, truncated file) falls
+    back to wave.open.
+    """
+    try:
+        with open(path, "rb") as f:
+            hdr = f.read(44)
+        if (len(hdr) == 44 and hdr[:4] == b"RIFF" and hdr[8:12] == b"WAVE"
+                and hdr[12:16] == b"fmt " and hdr[36:40] == b"data"):
+            byte_rate = struct.unpack_from("<I", hdr, 28)[0]
+            data_size = struct.unpack_from("<I", hdr, 40)[0]
+            if byte_rate:
+                return data_size / byte_rate
+    except (OSError, struct.error):
+        pass
+    with contextlib.closing(wave.open(path, "r")) as wf:
+        frames = wf.getnframes()
+        rate = wf.getframerate()
+        return frames / float(rate)
+
+
+# Timestamp components are bounded (hours clamped to two digits, minutes and
+# seconds 0..59, millis 0..999), so the zero-padded strings are precomputed
+# once and the hot-loop formatter is pure list indexing + concatenation.
+_HH = [f"{i:02d}" for i in range(100)]
+_MM = [f"{i:02d}" for i in range(60)]
+_MS = [f"{i:03d}" for i in range(1000)]
+
+
+def _fmt_ts(t: float) -> str:
+    """Format seconds as an SRT timestamp (HH:MM:SS,mmm)."""
+    whole = int(t)
+    h, rem = divmod(whole, 3600)
+    m, s = divmod(rem, 60)
+    ms = int((t - whole) * 1000)
+    hh = _HH[h] if h < 100 else f"{h:02d}"
+    return hh + ":" + _MM[m] + ":" + _MM[s] + "," + _MS[ms]
+
+
+def _srt_blocks(segments: List[Dict[str, Any]]):
+    """Yield one ready-to-write, UTF-8-encoded SRT block per segment."""
+    for idx, seg in enumerate(segments, start=1):
+        yield f"{idx}\n{_fmt_ts(seg['start'])} --> {_fmt_ts(seg['end'])}\n{seg.get('text', '')}\n\n".encode("utf-8")
+
+
+@lru_cache(maxsize=4)
+def get_stt_agent(model_size: str = "tiny", device: Optional[str] = None) -> "STTAgent":
+    """
+    Shared, process-lifetime STTAgent per (model_size, device).
+
+    Loading a whisper checkpoint takes seconds and dominates short runs;
+    repeated run_conversation calls (tests, a server re-invoking the CLI
+    flow) reuse the already-loaded weights instead of paying it again.
+    """
+    return STTAgent(model_size=model_size, device=device)
+
 
 class STTAgent:
     def __init__(self, model_size: str = "tiny", force_mock: Optional[bool] = None, device: Optional[str] = None):
@@ -28,10 +112,18 @@ class STTAgent:
         self.force_mock = bool(force_mock)
         self.model_size = model_size
         self.device = device
+        # Per-request timeout (seconds) for the OpenAI API backend.
+        self.request_timeout = float(os.getenv("CW_LLM_TIMEOUT", "15"))
+        # WAV duration cache keyed by (path, mtime_ns, size); see _wav_duration.
+        self._dur_cache: Dict[tuple, float] = {}
+        # Set when the selected backend has a known segment schema.
+        self._trusted_schema = False
 
         self.impl_name: Optional[str] = None
         self.impl_module: Optional[Any] = None
         self.model: Optional[Any] = None
+        self.pipe: Optional[Any] = None  # faster-whisper BatchedInferencePipeline
+        self.openai_client: Optional[Any] = None
 
         if self.force_mock:
             logger.info("[STTAgent] CW_STT_FORCE_MOCK set -> running in MOCK mode.")
@@ -42,52 +134,140 @@ class STTAgent:
         if self.model_size.lower() == "openai":
             try:
                 import openai  # type: ignore
+                from openai import OpenAI  # type: ignore
                 self.impl_name = "openai"
                 self.impl_module = openai
+                # One client for the agent's lifetime: reuses the underlying
+                # HTTP connection pool across transcriptions.
+                self.openai_client = OpenAI(timeout=self.request_timeout)
                 logger.info("[STTAgent] Using OpenAI API backend for STT.")
                 return
             except Exception as e:
                 logger.warning("[STTAgent] Failed to init OpenAI API backend: %s", e)
 
-        # --- Try whisper_timestamped ---
-        try:
-            import whisper_timestamped as wst  # type: ignore
-            self.impl_module = wst
-            if hasattr(wst, "load_model"):
-                logger.info("[STTAgent] Loading whisper_timestamped model '%s' ...", self.model_size)
-                self.model = wst.load_model(self.model_size, device=self.device)
-            self.impl_name = "whisper_timestamped"
-            logger.info("[STTAgent] Using whisper_timestamped backend.")
-            return
-        except ImportError:
-            logger.debug("[STTAgent] whisper_timestamped not installed.")
-        except Exception as e:
-            logger.warning("[STTAgent] whisper_timestamped failed: %s", e)
-
-        # --- Try openai-whisper (local) ---
-        try:
-            import whisper as wh  # type: ignore
-            self.impl_module = wh
-            if hasattr(wh, "load_model"):
-                logger.info("[STTAgent] Loading openai-whisper model '%s' ...", self.model_size)
-                self.model = wh.load_model(self.model_size, device=self.device)
-            self.impl_name = "whisper"
-            logger.info("[STTAgent] Using openai-whisper backend.")
-            return
-        except ImportError:
-            logger.debug("[STTAgent] openai-whisper not installed.")
-        except Exception as e:
-            logger.warning("[STTAgent] openai-whisper failed: %s", e)
+        # --- Try whisper_timestamped, then openai-whisper (local) ---
+        # Imports happen lazily here (not at module import) so MOCK/OpenAI
+        # construction above never touches torch; each loader is only run
+        # if the previous backend was unavailable.
+        for impl_name, loader in (
+            ("faster_whisper", self._load_faster_whisper),
+            ("whisper_timestamped", self._load_whisper_timestamped),
+            ("whisper", self._load_whisper),
+        ):
+            try:
+                mod = loader()
+                if mod is None:
+                    continue
+                self.impl_module = mod
+                self.impl_name = impl_name
+                # Known whisper backends emit a fixed segment schema, so
+                # transcribe() can skip the defensive per-segment checks.
+                self._trusted_schema = True
+                logger.info("[STTAgent] Using %s backend.", impl_name)
+                self._warmup()
+                return
+            except Exception as e:
+                logger.warning("[STTAgent] %s failed: %s", impl_name, e)
 
         # --- Neither backend worked ---
         logger.warning("[STTAgent] No whisper backend available; falling back to MOCK STT.")
         self.impl_name = "mock"
 
+    def _load_faster_whisper(self) -> Optional[Any]:
+        fw = _try_import("faster_whisper")
+        if fw is None:
+            return None
+        if self.model_size not in ("none", "skip"):
+            device = self.device
+            if device is None:
+                try:
+                    import torch  # type: ignore
+                    device = "cuda" if torch.cuda.is_available() else "cpu"
+                except Exception:
+                    device = "cpu"
+            # int8_float16 on GPU keeps the footprint small enough for
+            # several concurrent sessions; plain int8 on CPU. num_workers
+            # stays 1 — a single GPU gains nothing from more.
+            compute_type = "int8_float16" if device == "cuda" else "int8"
+            logger.info("[STTAgent] Loading faster-whisper model '%s' on %s (%s) ...",
+                        self.model_size, device, compute_type)
+            self.model = fw.WhisperModel(
+                self.model_size,
+                device=device,
+                compute_type=compute_type,
+                num_workers=1,
+            )
+            self.pipe = fw.BatchedInferencePipeline(model=self.model)
+            self.device = device
+        return fw
+
+    def _warmup(self) -> None:
+        """
+        Transcribe 30s of silence once at init so CUDA/cudnn kernel setup
+        and the CTranslate2 workspace allocation happen here instead of
+        inflating the first user-facing turn. Failure is non-fatal.
+        """
+        if self.model is None:
+            return
+        try:
+            import numpy as np
+            silence = np.zeros(16000 * 30, dtype=np.float32)
+            if self.impl_name == "faster_whisper":
+                seg_iter, _ = self.pipe.transcribe(silence, language="he", batch_size=16)
+                for _ in seg_iter:  # generator only runs when consumed
+                    pass
+            else:
+                self.model.transcribe(silence, language="he")
+            logger.info("[STTAgent] Warmup transcription done.")
+        except Exception as e:
+            logger.debug("[STTAgent] Warmup skipped: %s", e)
+
+    def _load_whisper_timestamped(self) -> Optional[Any]:
+        wst = _try_import("whisper_timestamped")
+        if wst is None:
+            return None
+        if hasattr(wst, "load_model") and self.model_size not in ("none", "skip"):
+            logger.info("[STTAgent] Loading whisper_timestamped model '%s' ...", self.model_size)
+            self.model = wst.load_model(self.model_size, device=self.device)
+        return wst
+
+    def _load_whisper(self) -> Optional[Any]:
+        wh = _try_import("whisper")
+        if wh is None:
+            return None
+        if hasattr(wh, "load_model") and self.model_size not in ("none", "skip"):
+            logger.info("[STTAgent] Loading openai-whisper model '%s' ...", self.model_size)
+            self.model = wh.load_model(self.model_size, device=self.device)
+        return wh
+
+    # Clips shorter than this get greedy decoding; see _fast_decode_kwargs.
+    _FAST_DECODE_MAX_SEC = 15.0
+
+    @classmethod
+    def _fast_decode_kwargs(cls, dur: float) -> Dict[str, Any]:
+        """
+        Decode options for short clips. Demo turns are a few seconds each,
+        where the default beam_size=5 search buys nothing: greedy decode at
+        temperature 0 halves decoder work, and with only one or two segments
+        per clip conditioning on the previous text just adds prompt tokens.
+        Long/unknown-duration audio keeps the backend defaults.
+        """
+        if not 0.0 < dur < cls._FAST_DECODE_MAX_SEC:
+            return {}
+        return {
+            "beam_size": 1,
+            "best_of": 1,
+            "temperature": 0.0,
+            "condition_on_previous_text": False,
+        }
+
     def transcribe(self, audio_path: str, language: Optional[str] = None) -> Dict[str, Any]:
         """Always returns a dict with 'text', 'segments', 'language'."""
 
         # --- Mock mode ---
-        if self.impl_name == "mock" or self.model is None:
+        # The openai backend carries a client, not a local model, so the
+        # missing-model guard must not swallow it.
+        if self.impl_name == "mock" or (self.impl_name != "openai" and self.model is None):
             segs = [self._single_segment_from_wav(audio_path, "[MOCK TRANSCRIPT - STT not available]")]
             full_text = " ".join(s["text"] for s in segs if isinstance(s, dict))
             return {"text": full_text, "segments": segs, "language": language or "und"}
@@ -95,14 +275,23 @@ class STTAgent:
         # --- OpenAI API backend ---
         if self.impl_name == "openai":
             try:
-                from openai import OpenAI
-                client = OpenAI()
-                with open(audio_path, "rb") as f:
-                    resp = client.audio.transcriptions.create(
-                        model="gpt-4o-mini-transcribe",
-                        file=f
-                    )
-                text = resp["text"]
+                from concurrent.futures import ThreadPoolExecutor
+                # Run the request in a worker so a stalled provider hits
+                # our timeout instead of hanging the pipeline. No context
+                # manager: its shutdown(wait=True) would block on the very
+                # thread we're timing out, so abandon it instead.
+                ex = ThreadPoolExecutor(max_workers=1)
+                try:
+                    with open(audio_path, "rb") as f:
+                        fut = ex.submit(
+                            self.openai_client.audio.transcriptions.create,
+                            model="gpt-4o-mini-transcribe",
+                            file=f,
+                        )
+                        resp = fut.result(timeout=self.request_timeout)
+                finally:
+                    ex.shutdown(wait=False)
+                text = resp.text  # v1 SDK returns a pydantic Transcription model
                 dur = self._wav_duration(audio_path)
                 segs = [{"start": 0.0, "end": dur, "text": text}]
                 return {"text": text, "segments": segs, "language": language or "und"}
@@ -112,11 +301,27 @@ class STTAgent:
                 return {"text": "[OPENAI STT ERROR]", "segments": segs, "language": "und"}
 
         # --- Local whisper backends ---
+        fast_kwargs = self._fast_decode_kwargs(self._wav_duration(audio_path))
         try:
-            if self.impl_name == "whisper_timestamped":
-                res = self.model.transcribe(audio_path, language=language)
+            if self.impl_name == "faster_whisper":
+                seg_iter, info = self.pipe.transcribe(
+                    audio_path,
+                    language=language,
+                    batch_size=16,
+                    vad_filter=True,
+                    word_timestamps=False,
+                    **fast_kwargs,
+                )
+                # Adapt the Segment namedtuples to the dict shape the
+                # normalization below expects.
+                res = {
+                    "segments": [{"start": s.start, "end": s.end, "text": s.text} for s in seg_iter],
+                    "language": getattr(info, "language", None) or language or "und",
+                }
+            elif self.impl_name == "whisper_timestamped":
+                res = self.model.transcribe(audio_path, language=language, **fast_kwargs)
             elif self.impl_name == "whisper":
-                res = self.model.transcribe(audio_path, language=language)
+                res = self.model.transcribe(audio_path, language=language, **fast_kwargs)
             else:
                 res = {}
         except Exception as e:
@@ -131,29 +336,159 @@ class STTAgent:
             segs = [self._single_segment_from_wav(audio_path, txt)]
             return {"text": txt, "segments": segs, "language": res.get("language", language or "und")}
 
+        # Fallback end time is invariant across segments; read it once.
+        dur = self._wav_duration(audio_path)
+        segments, texts = self._normalize_segments(raw_segments, dur)
+
+        if not segments:
+            segments = [self._single_segment_from_wav(audio_path, "[EMPTY TRANSCRIPT]")]
+            texts = [segments[0]["text"]]
+
+        full_text = " ".join(texts)
+        return {"text": full_text, "segments": segments, "language": res.get("language", language or "und")}
+
+    def _normalize_segments(self, raw_segments, dur: float):
+        """
+        Turn backend segments into ({'start','end','text'} dicts, texts).
+
+        Known whisper backends emit a fixed schema, so when _trusted_schema
+        is set the hot loop is plain key access — no per-field defaults,
+        casts or try/except per segment. A single schema surprise drops us
+        back to the defensive loop for the whole batch.
+        """
+        if self._trusted_schema:
+            try:
+                segments = []
+                texts = []
+                for s in raw_segments:
+                    text = s["text"].strip()
+                    segments.append({"start": s["start"], "end": s["end"], "text": text})
+                    if text:
+                        texts.append(text)
+                return segments, texts
+            except (KeyError, TypeError, AttributeError) as e:
+                logger.debug("[STTAgent] Trusted-schema normalization failed (%s); using safe path.", e)
+        return self._normalize_segments_safe(raw_segments, dur)
+
+    def _normalize_segments_safe(self, raw_segments, dur: float):
         segments: List[Dict[str, Any]] = []
+        texts: List[str] = []
         for s in raw_segments:
             try:
                 start = float(s.get("start", 0.0))
-                end = float(s.get("end", self._wav_duration(audio_path)))
+                end = float(s.get("end", dur))
                 text = str(s.get("text", "")).strip()
                 segments.append({"start": start, "end": end, "text": text})
+                if text:
+                    texts.append(text)
             except Exception:
                 logger.debug("[STTAgent] Skipping malformed segment: %s", repr(s))
                 continue
+        return segments, texts
+
+    @property
+    def supports_array(self) -> bool:
+        """Whether transcribe_array can be used with the active backend."""
+        return self.impl_name in ("faster_whisper", "whisper_timestamped", "whisper", "mock")
+
+    def transcribe_array(self, pcm: Any, sr: int = 16000, language: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Transcribe 16 kHz mono float32 PCM already held in memory, skipping
+        the file re-open/decode the path-based entry point pays. Same return
+        shape as transcribe(). Local whisper backends accept the ndarray
+        directly; the OpenAI API backend needs a file, so callers should
+        check supports_array first.
+        """
+        dur = (len(pcm) / float(sr)) if sr else 0.0
+
+        if self.impl_name == "mock" or self.model is None:
+            seg = {"start": 0.0, "end": dur, "text": "[MOCK TRANSCRIPT - STT not available]"}
+            return {"text": seg["text"], "segments": [seg], "language": language or "und"}
+
+        fast_kwargs = self._fast_decode_kwargs(dur)
+        try:
+            if self.impl_name == "faster_whisper":
+                seg_iter, info = self.pipe.transcribe(
+                    pcm, language=language, batch_size=16, vad_filter=True, word_timestamps=False,
+                    **fast_kwargs,
+                )
+                res = {
+                    "segments": [{"start": s.start, "end": s.end, "text": s.text} for s in seg_iter],
+                    "language": getattr(info, "language", None) or language or "und",
+                }
+            else:
+                res = self.model.transcribe(pcm, language=language, **fast_kwargs)
+        except Exception as e:
+            logger.exception("[STTAgent] In-memory transcription failed: %s", e)
+            seg = {"start": 0.0, "end": dur, "text": "[TRANSCRIBE ERROR]"}
+            return {"text": seg["text"], "segments": [seg], "language": language or "und"}
+
+        raw_segments = res.get("segments", []) if isinstance(res, dict) else []
+        if isinstance(res, dict) and "text" in res and not raw_segments:
+            txt = str(res.get("text", "")).strip()
+            return {"text": txt, "segments": [{"start": 0.0, "end": dur, "text": txt}],
+                    "language": res.get("language", language or "und")}
+
+        segments, texts = self._normalize_segments(raw_segments, dur)
 
         if not segments:
-            segments = [self._single_segment_from_wav(audio_path, "[EMPTY TRANSCRIPT]")]
+            segments = [{"start": 0.0, "end": dur, "text": "[EMPTY TRANSCRIPT]"}]
+            texts = [segments[0]["text"]]
 
-        full_text = " ".join(seg["text"] for seg in segments if seg.get("text")).strip()
-        return {"text": full_text, "segments": segments, "language": res.get("language", language or "und")}
+        return {"text": " ".join(texts), "segments": segments,
+                "language": res.get("language", language or "und")}
+
+    def transcribe_batch(self, audio_paths: List[str], language: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Transcribe several files in one pass, in input order.
+
+        With the faster-whisper backend each file already runs through the
+        BatchedInferencePipeline, so the encoder is amortized across chunks;
+        issuing the files back-to-back here also keeps the model hot instead
+        of interleaving transcription with TTS/LLM work between turns.
+        """
+        return [self.transcribe(p, language) for p in audio_paths]
+
+    async def transcribe_many(self, audio_paths: List[str], language: Optional[str] = None,
+                              concurrency: int = 4) -> List[Dict[str, Any]]:
+        """
+        Transcribe several files concurrently with bounded fan-out.
+        Each transcription runs in a worker thread (the backends release
+        the GIL in their native code / block on I/O), so N files finish
+        in roughly max latency x ceil(N / concurrency) instead of the sum.
+        Results are returned in input order.
+        """
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(path: str) -> Dict[str, Any]:
+            async with sem:
+                return await asyncio.to_thread(self.transcribe, path, language)
+
+        return list(await asyncio.gather(*(one(p) for p in audio_paths)))
+
+    def close(self) -> None:
+        """Drop model references and release GPU memory if applicable."""
+        self.model = None
+        self.pipe = None
+        try:
+            import torch  # type: ignore
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except Exception:
+            pass
 
     def _wav_duration(self, path: str) -> float:
+        # The same WAV can be probed several times per turn (mock segment,
+        # per-segment end fallback, SRT export); key on (path, mtime, size)
+        # so repeats collapse to a dict hit but edited files re-read.
         try:
-            with contextlib.closing(wave.open(path, "r")) as wf:
-                frames = wf.getnframes()
-                rate = wf.getframerate()
-                return frames / float(rate)
+            st = os.stat(path)
+            key = (path, st.st_mtime_ns, st.st_size)
+            dur = self._dur_cache.get(key)
+            if dur is None:
+                dur = _read_wav_duration(path)
+                self._dur_cache[key] = dur
+            return dur
         except Exception:
             return 0.0
 
@@ -162,20 +497,8 @@ class STTAgent:
         return {"start": 0.0, "end": dur, "text": text}
 
     def export_srt(self, segments: List[Dict[str, Any]], out_path: str) -> None:
-        def fmt(t: float) -> str:
-            ms = int((t - int(t)) * 1000)
-            h = int(t // 3600)
-            m = int((t % 3600) // 60)
-            s = int(t % 60)
-            return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
-
-        lines = []
-        for idx, seg in enumerate(segments, start=1):
-            lines.append(str(idx))
-            lines.append(f"{fmt(seg['start'])} --> {fmt(seg['end'])}")
-            lines.append(seg.get("text", ""))
-            lines.append("")
-
+        # Stream pre-encoded blocks straight to a buffered binary file:
+        # no whole-file string, no TextIOWrapper encode per write.
         os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
-        with open(out_path, "w", encoding="utf-8") as fh:
-            fh.write("\n".join(lines))
+        with open(out_path, "wb", buffering=1 << 20) as fh:
+            fh.writelines(_srt_blocks(segments))
@@ -8,8 +8,15 @@ import json
 import logging
 from datetime import datetime
 
+# orjson serializes UTF-8 natively in C — much faster than the stdlib's
+# character-level ensure_ascii=False path for Hebrew text. Optional.
+try:
+    import orjson
+except Exception:
+    orjson = None
+
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
+logger.addHandler(logging.NullHandler())  # logging config belongs to the app entrypoint
 
 
 class TranscriptAgent:
@@ -17,15 +24,48 @@ class TranscriptAgent:
         self.out_dir = Path(out_dir)
         self.out_dir.mkdir(parents=True, exist_ok=True)
         self.conversation = []
+        # Append-only JSONL stream: each turn is one O(1) line write at
+        # add_turn time, so the transcript survives a crash mid-run and
+        # save() is no longer the only durable copy. Opened lazily on the
+        # first turn (constructing the agent shouldn't litter empty files)
+        # with a per-run timestamped name; microseconds in the stamp keep
+        # two runs within the same second from sharing one file.
+        self.jsonl_path = None
+        self._fh = None
+
+    def _jsonl_handle(self):
+        if self._fh is None:
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            self.jsonl_path = self.out_dir / f"conversation_{stamp}.jsonl"
+            self._fh = open(self.jsonl_path, "ab")
+        return self._fh
 
     def add_turn(self, speaker: str, text: str):
         ts = datetime.now().isoformat(timespec="seconds")
         entry = {"time": ts, "speaker": speaker, "text": text}
         self.conversation.append(entry)
+        if orjson is not None:
+            line = orjson.dumps(entry)
+        else:
+            line = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        fh = self._jsonl_handle()
+        fh.write(line + b"\n")
+        fh.flush()
+
+    def close(self):
+        if self._fh is None:
+            return
+        try:
+            self._fh.close()
+        except Exception:
+            pass
 
     def save(self, fname="conversation.json"):
         path = self.out_dir / fname
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(self.conversation, f, ensure_ascii=False, indent=2)
+        if orjson is not None:
+            path.write_bytes(orjson.dumps(self.conversation, option=orjson.OPT_INDENT_2))
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.conversation, f, ensure_ascii=False, indent=2)
         logger.info(f"Transcript saved: {path}")
         return str(path)
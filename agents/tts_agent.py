@@ -4,10 +4,10 @@ from typing import Dict, Optional
 from pydub import AudioSegment
 from pydub.generators import Sine
 import logging
-import tempfile, os
+import tempfile, os, threading, wave
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
+logger.addHandler(logging.NullHandler())  # logging config belongs to the app entrypoint
 
 
 class TTSAgent:
@@ -15,16 +15,62 @@ class TTSAgent:
         self.out_dir = Path(out_dir)
         self.out_dir.mkdir(parents=True, exist_ok=True)
         self.backend = backend.lower()
+        self._piper_voice = None  # loaded lazily on first piper synthesis
+        # synthesize() runs from thread pools in batched mode, so the lazy
+        # load must not race and load the voice model twice.
+        self._piper_lock = threading.Lock()
 
     def synthesize(self, text: str, out_name: str, phonemes: Optional[str] = None) -> Dict:
         """
-        Always use gTTS for Hebrew speech.
-        Returns: {"path": str, "duration_ms": int, "sample_rate": 16000}
+        backend="piper" uses a local neural voice (no network, PCM written
+        directly); everything else goes through gTTS for Hebrew speech.
+        Returns: {"path": str, "duration_ms": int, "sample_rate": 16000, ...}
         """
         target = str(self.out_dir / out_name)
         input_for_tts = phonemes if phonemes and phonemes.strip() else text
+        if self.backend == "piper":
+            try:
+                return self._synthesize_piper(input_for_tts, target)
+            except Exception as e:
+                logger.warning("piper TTS failed: %s — falling back to gTTS", e)
         return self._synthesize_gtts(input_for_tts, target)
 
+    def _synthesize_piper(self, text: str, out_path: str) -> Dict:
+        """
+        Local piper-tts synthesis: emits 16-bit PCM straight into the target
+        WAV — no HTTPS round trip, no temp mp3, no ffmpeg decode. The voice
+        model path comes from CW_PIPER_MODEL and is loaded once per agent.
+        """
+        from piper import PiperVoice
+        import numpy as np
+        from scipy.signal import resample_poly
+
+        with self._piper_lock:
+            if self._piper_voice is None:
+                model_path = os.getenv("CW_PIPER_MODEL", "")
+                if not model_path:
+                    raise RuntimeError("CW_PIPER_MODEL not set (path to a piper .onnx voice)")
+                self._piper_voice = PiperVoice.load(model_path)
+            voice = self._piper_voice
+
+        # piper-tts >= 1.3: synthesize() yields AudioChunk objects
+        chunks = list(voice.synthesize(text))
+        raw = b"".join(c.audio_int16_bytes for c in chunks)
+        pcm = np.frombuffer(raw, dtype=np.int16)
+        native_sr = int(chunks[0].sample_rate) if chunks else 16000
+        if native_sr != 16000:
+            resampled = resample_poly(pcm.astype(np.float32), 16000, native_sr)
+            pcm = np.clip(resampled, -32768, 32767).astype(np.int16)
+
+        with wave.open(out_path, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(16000)
+            wf.writeframes(pcm.tobytes())
+
+        return {"path": out_path, "duration_ms": int(len(pcm) / 16.0), "sample_rate": 16000,
+                "already_normalized": True, "pcm": pcm.astype(np.float32) / 32768.0}
+
     def _synthesize_gtts(self, text: str, out_path: str) -> Dict:
         from gtts import gTTS
 
@@ -49,7 +95,20 @@ class TTSAgent:
         # Now safe to delete
         os.unlink(tmp_mp3.name)
 
-        return {"path": out_path, "duration_ms": len(seg), "sample_rate": 16000}
+        # already_normalized: output is 16k mono PCM, callers can skip
+        # their own resample pass
+        return {"path": out_path, "duration_ms": len(seg), "sample_rate": 16000,
+                "already_normalized": True, "pcm": self._pcm_float32(seg)}
+
+    @staticmethod
+    def _pcm_float32(seg: AudioSegment):
+        """Decoded samples as float32 in [-1, 1] so STT can consume the
+        audio in-memory instead of re-decoding the WAV from disk."""
+        try:
+            import numpy as np
+            return np.frombuffer(seg.raw_data, np.int16).astype(np.float32) / 32768.0
+        except Exception:
+            return None
 
     def _synthesize_mock(self, text: str, out_path: str) -> Dict:
         """Fallback: simple beep if gTTS fails."""
@@ -59,4 +118,5 @@ class TTSAgent:
         seg = tone + silence
         seg = seg.set_frame_rate(16000).set_channels(1)
         seg.export(out_path, format="wav")
-        return {"path": out_path, "duration_ms": len(seg), "sample_rate": 16000}
+        return {"path": out_path, "duration_ms": len(seg), "sample_rate": 16000,
+                "already_normalized": True, "pcm": self._pcm_float32(seg)}
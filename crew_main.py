@@ -18,10 +18,14 @@ Requires:
 """
 
 import argparse
+import contextlib
 import json
 import logging
 import os
-from datetime import datetime, timedelta
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 
@@ -30,7 +34,7 @@ from pydub import AudioSegment
 # Agent imports (expect these modules to exist in agents/)
 from agents.nikud_agent import NikudAgent
 from agents.tts_agent import TTSAgent
-from agents.stt_agent import STTAgent
+from agents.stt_agent import STTAgent, get_stt_agent
 from agents.cs_agent import CustomerServiceAgent
 from agents.transcript_agent import TranscriptAgent
 from agents.logger_agent import LoggerAgent
@@ -62,70 +66,136 @@ def now_iso() -> str:
     return datetime.now().isoformat(timespec="seconds")
 
 def safe_write_json(obj, path: Path):
-    with open(path, "w", encoding="utf-8") as fh:
-        json.dump(obj, fh, ensure_ascii=False, indent=2)
+    # orjson encodes UTF-8 in C and returns bytes for one write_bytes call;
+    # fall back to stdlib json when it isn't installed.
+    try:
+        import orjson
+        path.write_bytes(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+    except ImportError:
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(obj, fh, ensure_ascii=False, indent=2)
 
 def ensure_wav_mono_16k(path: Path) -> Path:
     """
     Normalize audio to 16k mono WAV using pydub (ffmpeg must be installed).
     Returns path to normalized file (may overwrite).
+    Files that are already 16k mono 16-bit PCM are detected with a cheap
+    wave-header peek and left untouched — no ffmpeg round trip.
     """
+    try:
+        with contextlib.closing(wave.open(str(path), "rb")) as wf:
+            if (wf.getframerate() == 16000 and wf.getnchannels() == 1
+                    and wf.getsampwidth() == 2):
+                return path
+    except Exception:
+        pass  # not a readable PCM WAV -> transcode below
+
     seg = AudioSegment.from_file(path)
     seg = seg.set_frame_rate(16000).set_channels(1)
     seg.export(path, format="wav")
     return path
 
 # ---------- SRT exporter ----------
+def _srt_ts_components(t):
+    """Split an ndarray of seconds into (h, m, s, ms) integer arrays."""
+    whole = t.astype("int64")
+    return whole // 3600, (whole % 3600) // 60, whole % 60, ((t - whole) * 1000).astype("int64")
+
+
 def segments_to_srt(segments: List[Dict], out_path: Path):
     """
     segments: list of dicts with keys: start (s), end (s), text
     Creates a basic SRT file with 0-based segments.
+    Timestamp components are computed in bulk over ndarrays instead of
+    building a timedelta per segment, and the file is written in one pass.
     """
-    def fmt_ts(seconds: float) -> str:
-        td = timedelta(seconds=seconds)
-        total_seconds = int(td.total_seconds())
-        hours = total_seconds // 3600
-        minutes = (total_seconds % 3600) // 60
-        secs = total_seconds % 60
-        millis = int((td.total_seconds() - int(td.total_seconds())) * 1000)
-        return f"{hours:02}:{minutes:02}:{secs:02},{millis:03}"
-
-    lines = []
-    for i, seg in enumerate(segments, start=1):
-        start = seg.get("start", seg.get("start_time", 0.0))
-        end = seg.get("end", seg.get("end_time", start + 1.0))
+    import numpy as np
+
+    n = len(segments)
+    starts = np.fromiter(
+        (seg.get("start", seg.get("start_time", 0.0)) for seg in segments), np.float64, n)
+    ends = np.fromiter(
+        (seg.get("end", seg.get("end_time", np.nan)) for seg in segments), np.float64, n)
+    ends = np.where(np.isnan(ends), starts + 1.0, ends)
+
+    sh, sm, ss, sms = _srt_ts_components(starts)
+    eh, em, es, ems = _srt_ts_components(ends)
+
+    blocks = []
+    for i, seg in enumerate(segments):
         text = seg.get("text", "").replace("\n", " ").strip()
-        lines.append(f"{i}")
-        lines.append(f"{fmt_ts(start)} --> {fmt_ts(end)}")
-        lines.append(text)
-        lines.append("")  # blank line
-    out_path.write_text("\n".join(lines), encoding="utf-8")
+        blocks.append(
+            f"{i+1}\n"
+            f"{sh[i]:02}:{sm[i]:02}:{ss[i]:02},{sms[i]:03} --> "
+            f"{eh[i]:02}:{em[i]:02}:{es[i]:02},{ems[i]:03}\n"
+            f"{text}\n"
+        )
+    out_path.write_text("\n".join(blocks), encoding="utf-8")
     logger.info("Wrote SRT: %s", out_path)
 
 # ---------- Audio stitching ----------
+def _read_pcm_16k_mono(path: Path):
+    """Read a file as int16 samples at 16k mono. Plain PCM WAVs are read
+    directly via the wave module; anything else goes through pydub."""
+    import numpy as np
+    try:
+        with contextlib.closing(wave.open(str(path), "rb")) as wf:
+            if (wf.getframerate() == 16000 and wf.getnchannels() == 1
+                    and wf.getsampwidth() == 2):
+                return np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    except Exception:
+        pass
+    seg = AudioSegment.from_file(path)
+    seg = seg.set_frame_rate(16000).set_channels(1).set_sample_width(2)
+    return np.frombuffer(seg.raw_data, dtype=np.int16)
+
+
 def stitch_audio(audio_paths: List[Path], out_path: Path, pause_ms: int = 150) -> Optional[Path]:
     """
     Concatenate given audio files into a single WAV.
-    Returns out_path if successful, else None.
+    Files are read in parallel (file I/O and any ffmpeg decode overlap
+    across a thread pool), then raw int16 PCM is joined with one
+    np.concatenate (one allocation, one write) instead of pydub's
+    repeated AudioSegment `+`, which copies the accumulated buffer for
+    every segment. Returns out_path if successful, else None.
     """
-    segments = []
-    for p in audio_paths:
-        if p and p.exists():
-            try:
-                seg = AudioSegment.from_file(p)
-                segments.append(seg)
-            except Exception as e:
-                logger.warning("Failed reading audio %s: %s", p, e)
-
-    if not segments:
+    import numpy as np
+
+    def read_one(p: Optional[Path]):
+        if not (p and p.exists()):
+            return None
+        try:
+            return _read_pcm_16k_mono(p)
+        except Exception as e:
+            logger.warning("Failed reading audio %s: %s", p, e)
+            return None
+
+    if not audio_paths:
+        logger.warning("No audio segments to stitch.")
+        return None
+    with ThreadPoolExecutor(max_workers=min(8, len(audio_paths))) as ex:
+        datas = list(ex.map(read_one, audio_paths))
+
+    sr = 16000
+    silence = np.zeros(sr * pause_ms // 1000, dtype=np.int16)
+    parts = []
+    for data in datas:
+        if data is None:
+            continue
+        if parts:
+            parts.append(silence)
+        parts.append(data)
+
+    if not parts:
         logger.warning("No audio segments to stitch.")
         return None
 
-    out = segments[0]
-    for seg in segments[1:]:
-        out += AudioSegment.silent(duration=pause_ms) + seg
-    out = out.set_frame_rate(16000).set_channels(1)
-    out.export(out_path, format="wav")
+    stitched = np.concatenate(parts)
+    with contextlib.closing(wave.open(str(out_path), "wb")) as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sr)
+        wf.writeframes(stitched.tobytes())
     logger.info("Stitched audio written: %s", out_path)
     return out_path
 
@@ -154,23 +224,29 @@ def run_turn(
     # 1) Client TTS
     client_v = nikud_agent.add_nikud(client_text)["vocalized"]
     client_wav = AUDIO_DIR / f"client_{turn_index+1}.wav"
-    t1 = datetime.now()
+    t1 = time.perf_counter_ns()
     tts_res = tts_agent.synthesize(client_v, client_wav.name, phonemes=None)
-    t2 = datetime.now()
+    t2 = time.perf_counter_ns()
     meta["client_audio"] = str(client_wav)
     meta["tts_client_duration_ms"] = tts_res.get("duration_ms")
-    meta["tts_client_time_s"] = (t2 - t1).total_seconds()
+    meta["tts_client_time_s"] = (t2 - t1) / 1e9
     logger_agent.log({"role": "client_tts", "turn": turn_index, "text": client_text, "audio": str(client_wav)})
 
-    # Normalize audio for STT
-    try:
-        ensure_wav_mono_16k(client_wav)
-    except Exception as e:
-        logger.warning("Failed to normalize client audio: %s", e)
+    # Normalize audio for STT (no-op when TTS already emitted 16k mono)
+    if not tts_res.get("already_normalized"):
+        try:
+            ensure_wav_mono_16k(client_wav)
+        except Exception as e:
+            logger.warning("Failed to normalize client audio: %s", e)
 
-    # 2) STT
+    # 2) STT — feed the PCM the TTS step already decoded when the backend
+    # can take an in-memory array; otherwise fall back to the file path.
     try:
-        stt_out = stt_agent.transcribe(str(client_wav))
+        pcm = tts_res.get("pcm")
+        if pcm is not None and stt_agent.supports_array:
+            stt_out = stt_agent.transcribe_array(pcm)
+        else:
+            stt_out = stt_agent.transcribe(str(client_wav))
         stt_text = stt_out.get("text", "").strip()
         meta["stt_text"] = stt_text
         meta["stt_segments"] = stt_out.get("segments", [])
@@ -196,12 +272,12 @@ def run_turn(
     try:
         reply_v = nikud_agent.add_nikud(reply_text)["vocalized"]
         agent_wav = AUDIO_DIR / f"agent_{turn_index+1}.wav"
-        t3 = datetime.now()
+        t3 = time.perf_counter_ns()
         tts_res2 = tts_agent.synthesize(reply_v, agent_wav.name, phonemes=None)
-        t4 = datetime.now()
+        t4 = time.perf_counter_ns()
         meta["agent_audio"] = str(agent_wav)
         meta["tts_agent_duration_ms"] = tts_res2.get("duration_ms")
-        meta["tts_agent_time_s"] = (t4 - t3).total_seconds()
+        meta["tts_agent_time_s"] = (t4 - t3) / 1e9
         logger_agent.log({"role": "agent_tts", "turn": turn_index, "text": reply_text, "audio": str(agent_wav)})
     except Exception as e:
         logger.exception("Agent TTS failed: %s", e)
@@ -215,17 +291,145 @@ def run_turn(
     meta["end_ts"] = now_iso()
     return meta
 
+# ---------- Batched (phased) orchestration ----------
+def run_turns_batched(
+    client_texts: List[str],
+    nikud_agent: NikudAgent,
+    tts_agent: TTSAgent,
+    stt_agent: STTAgent,
+    cs_agent: CustomerServiceAgent,
+    transcript_agent: TranscriptAgent,
+    logger_agent: LoggerAgent,
+) -> List[Dict]:
+    """
+    Phased variant of the turn loop for scripted clients (whose utterances
+    don't depend on the agent's replies):
+    - Phase A: nikud + TTS + normalization for every client turn
+    - Phase B: one batched STT pass over all client WAVs
+    - Phase C: CS reply + agent TTS per turn (stops early on 'close')
+    Batching phase B keeps the whisper model hot across files instead of
+    interleaving it with TTS/LLM work.
+    Returns the per-turn metadata dicts (same shape as run_turn's).
+    """
+    metas: List[Dict] = []
+
+    def _synthesize_client_turn(turn_index: int, client_text: str) -> Dict:
+        meta = {"turn": turn_index, "client_text": client_text, "ts": now_iso()}
+        logger.info("TURN %d (batched): client_text=%s", turn_index, client_text)
+        client_v = nikud_agent.add_nikud(client_text)["vocalized"]
+        client_wav = AUDIO_DIR / f"client_{turn_index+1}.wav"
+        t1 = time.perf_counter_ns()
+        tts_res = tts_agent.synthesize(client_v, client_wav.name, phonemes=None)
+        t2 = time.perf_counter_ns()
+        meta["client_audio"] = str(client_wav)
+        meta["tts_client_duration_ms"] = tts_res.get("duration_ms")
+        meta["tts_client_time_s"] = (t2 - t1) / 1e9
+        logger_agent.log({"role": "client_tts", "turn": turn_index, "text": client_text, "audio": str(client_wav)})
+        if not tts_res.get("already_normalized"):
+            try:
+                ensure_wav_mono_16k(client_wav)
+            except Exception as e:
+                logger.warning("Failed to normalize client audio: %s", e)
+        return meta
+
+    # Phases A+B overlapped: gTTS is an HTTPS round trip, so all client
+    # turns synthesize concurrently in a small thread pool; each turn's
+    # STT is submitted the moment its audio is ready, so the CPU-bound
+    # transcription of turn N runs under the still-in-flight TTS of
+    # turn N+1. The single STT worker keeps transcriptions back-to-back
+    # on the model (same effect as transcribe_batch) while preserving
+    # turn order.
+    with ThreadPoolExecutor(max_workers=4) as tts_pool, \
+            ThreadPoolExecutor(max_workers=1) as stt_pool:
+        tts_futures = [tts_pool.submit(_synthesize_client_turn, i, t)
+                       for i, t in enumerate(client_texts)]
+        stt_futures = []
+        for fut in tts_futures:
+            meta = fut.result()
+            metas.append(meta)
+            stt_futures.append(stt_pool.submit(stt_agent.transcribe, meta["client_audio"]))
+
+        for meta, stt_fut in zip(metas, stt_futures):
+            try:
+                stt_out = stt_fut.result()
+            except Exception as e:
+                logger.exception("Batched STT failed for turn %d: %s", meta["turn"], e)
+                stt_out = {"text": "", "segments": []}
+            stt_text = stt_out.get("text", "").strip()
+            meta["stt_text"] = stt_text
+            meta["stt_segments"] = stt_out.get("segments", [])
+            logger_agent.log({"role": "stt", "turn": meta["turn"], "transcript": stt_text})
+
+    # Phase C, stage 1: CS decisions for every turn. These are cheap
+    # (scripted/cached) and have to run in order anyway so the close
+    # action can truncate the conversation before any audio is spent on
+    # turns that won't happen.
+    reply_texts: Dict[int, str] = {}
+    cutoff = len(metas)
+    for meta in metas:
+        turn_index = meta["turn"]
+        stt_text = meta.get("stt_text", "")
+        try:
+            cs_resp = cs_agent.reply(stt_text or meta["client_text"])
+            reply_text = cs_resp.get("reply", "מצטער, לא הבנתי — אפשר לחזור בבקשה?")
+            meta["cs_action"] = cs_resp.get("action")
+            meta["reply_text"] = reply_text
+            logger_agent.log({"role": "cs_decision", "turn": turn_index, "action": cs_resp.get("action"), "text": reply_text})
+        except Exception as e:
+            logger.exception("CS agent failed: %s", e)
+            reply_text = "מצטער, יש בעיה טכנית. נא נסה מאוחר יותר."
+            meta["cs_error"] = str(e)
+        reply_texts[turn_index] = reply_text
+        if meta.get("cs_action") in ("close", "goodbye"):
+            logger.info("CS requested conversation close at turn %d", turn_index)
+            cutoff = turn_index + 1
+            break
+    metas = metas[:cutoff]
+
+    # Phase C, stage 2: agent TTS fanned out across threads — while turn
+    # N's gTTS HTTPS round trip is in flight, turn N+1's request is
+    # already out instead of waiting behind it.
+    def _synthesize_agent_turn(meta: Dict) -> None:
+        turn_index = meta["turn"]
+        reply_text = reply_texts[turn_index]
+        try:
+            reply_v = nikud_agent.add_nikud(reply_text)["vocalized"]
+            agent_wav = AUDIO_DIR / f"agent_{turn_index+1}.wav"
+            t3 = time.perf_counter_ns()
+            tts_res2 = tts_agent.synthesize(reply_v, agent_wav.name, phonemes=None)
+            t4 = time.perf_counter_ns()
+            meta["agent_audio"] = str(agent_wav)
+            meta["tts_agent_duration_ms"] = tts_res2.get("duration_ms")
+            meta["tts_agent_time_s"] = (t4 - t3) / 1e9
+            logger_agent.log({"role": "agent_tts", "turn": turn_index, "text": reply_text, "audio": str(agent_wav)})
+        except Exception as e:
+            logger.exception("Agent TTS failed: %s", e)
+            meta["tts_agent_error"] = str(e)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(_synthesize_agent_turn, metas))
+
+    # Transcript entries stay in turn order regardless of TTS completion order.
+    for meta in metas:
+        transcript_agent.add_turn("client", meta.get("stt_text") or meta["client_text"])
+        transcript_agent.add_turn("agent", reply_texts[meta["turn"]])
+        meta["end_ts"] = now_iso()
+
+    return metas
+
+
 # ---------- Orchestration runner ----------
 def run_conversation(
     max_turns: int,
     stt_model: str,
     tts_backend: str,
-    use_real_phonikud: bool
+    use_real_phonikud: bool,
+    batch_stt: bool = False
 ) -> Dict:
     # Instantiate agents
     nikud = NikudAgent(use_real_phonikud=use_real_phonikud)
     tts = TTSAgent(out_dir=str(AUDIO_DIR), backend=tts_backend)
-    stt = STTAgent(model_size=stt_model)
+    stt = get_stt_agent(stt_model)  # shared across runs: model loads once per process
     cs = CustomerServiceAgent()
     transcript = TranscriptAgent(out_dir=str(TRANS_DIR))
     logger_agent = LoggerAgent(out_dir=str(LOG_DIR))
@@ -239,47 +443,81 @@ def run_conversation(
         "stt_model": stt_model,
         "tts_backend": tts_backend,
         "use_real_phonikud": use_real_phonikud,
+        "batch_stt": batch_stt,
         "turns": []
     }
 
     audio_paths: List[Path] = []
-    for turn in range(max_turns):
-        if not supervisor.allow_new_turn(turn):
-            logger.info("Supervisor prevented new turn: %d", turn)
-            break
-
-        client_text = client.next_utterance()
-        if not client_text:
-            logger.info("Client finished scripted utterances at turn %d", turn)
-            break
 
-        meta = run_turn(
-            turn_index=turn,
-            client_text=client_text,
+    if batch_stt:
+        # Scripted utterances don't depend on replies, so collect them all
+        # up front and run the phased pipeline (TTS -> batched STT -> CS/TTS).
+        client_texts: List[str] = []
+        for turn in range(max_turns):
+            if not supervisor.allow_new_turn(turn):
+                logger.info("Supervisor prevented new turn: %d", turn)
+                break
+            client_text = client.next_utterance()
+            if not client_text:
+                logger.info("Client finished scripted utterances at turn %d", turn)
+                break
+            client_texts.append(client_text)
+
+        metas = run_turns_batched(
+            client_texts,
             nikud_agent=nikud,
             tts_agent=tts,
             stt_agent=stt,
             cs_agent=cs,
             transcript_agent=transcript,
-            logger_agent=logger_agent
+            logger_agent=logger_agent,
         )
-
-        run_meta["turns"].append(meta)
-
-        # collect audio paths for stitching
-        if meta.get("client_audio"):
-            audio_paths.append(Path(meta["client_audio"]))
-        if meta.get("agent_audio"):
-            audio_paths.append(Path(meta["agent_audio"]))
-
-        # check for end action from CS
-        if meta.get("cs_action") in ("close", "goodbye"):
-            logger.info("CS requested conversation close at turn %d", turn)
-            break
+        run_meta["turns"].extend(metas)
+        for meta in metas:
+            if meta.get("client_audio"):
+                audio_paths.append(Path(meta["client_audio"]))
+            if meta.get("agent_audio"):
+                audio_paths.append(Path(meta["agent_audio"]))
+
+    else:
+        for turn in range(max_turns):
+            if not supervisor.allow_new_turn(turn):
+                logger.info("Supervisor prevented new turn: %d", turn)
+                break
+
+            client_text = client.next_utterance()
+            if not client_text:
+                logger.info("Client finished scripted utterances at turn %d", turn)
+                break
+
+            meta = run_turn(
+                turn_index=turn,
+                client_text=client_text,
+                nikud_agent=nikud,
+                tts_agent=tts,
+                stt_agent=stt,
+                cs_agent=cs,
+                transcript_agent=transcript,
+                logger_agent=logger_agent
+            )
+
+            run_meta["turns"].append(meta)
+
+            # collect audio paths for stitching
+            if meta.get("client_audio"):
+                audio_paths.append(Path(meta["client_audio"]))
+            if meta.get("agent_audio"):
+                audio_paths.append(Path(meta["agent_audio"]))
+
+            # check for end action from CS
+            if meta.get("cs_action") in ("close", "goodbye"):
+                logger.info("CS requested conversation close at turn %d", turn)
+                break
 
     # Save transcripts & logs
     transcript_json = TRANS_DIR / f"transcript_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
     safe_write_json(transcript.conversation, transcript_json)
+    transcript.close()  # release the per-run JSONL append handle
     logger.info("Saved transcript json: %s", transcript_json)
 
     # Save run metadata
@@ -334,6 +572,8 @@ def parse_args():
     p.add_argument("--stt-model", type=str, default="tiny", help="Whisper model size (tiny, small, medium, large).")
     p.add_argument("--tts-backend", type=str, default="auto", help="TTS backend: auto, mock, pyttsx3, gtts.")
     p.add_argument("--phonikud", action="store_true", help="Use real phonikud if available.")
+    p.add_argument("--batch-stt", action="store_true",
+                   help="Synthesize all client turns first, then transcribe them in one batched STT pass.")
     return p.parse_args()
 
 def main():
@@ -345,7 +585,8 @@ def main():
         max_turns=args.turns,
         stt_model=args.stt_model,
         tts_backend=args.tts_backend,
-        use_real_phonikud=args.phonikud
+        use_real_phonikud=args.phonikud,
+        batch_stt=args.batch_stt
     )
 
     logger.info("Run complete. Summary:\n%s", json.dumps(run_meta, ensure_ascii=False, indent=2))